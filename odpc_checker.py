@@ -1,8 +1,13 @@
+# Heavy imports live inside the functions that use them so the app
+# starts quickly; pandas alone takes about a second to import
 import streamlit as st
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
+from streamlit.runtime.scriptrunner import (
+    add_script_run_ctx,
+    get_script_run_ctx,
+)
 from io import BytesIO
+import gzip
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------------------------------------------------
 # PAGE CONFIG
@@ -12,39 +17,235 @@ st.set_page_config(
     layout="wide"
 )
 
+# ---------------------------------------------------
+# HTTP SESSION
+# ---------------------------------------------------
+@st.cache_resource
+def get_session():
+    from requests.adapters import HTTPAdapter
+    from requests_cache import (
+        CachedSession,
+        SerializerPipeline,
+        Stage,
+        pickle_serializer,
+    )
+    from urllib3.util.retry import Retry
+
+    # Responses are stored gzipped in a local SQLite file so restarts
+    # reuse them
+    session = CachedSession(
+        "odpc_cache",
+        backend="sqlite",
+        serializer=SerializerPipeline(
+            [
+                pickle_serializer,
+                Stage(dumps=gzip.compress, loads=gzip.decompress),
+            ],
+            name="pickle+gzip",
+            is_binary=True,
+        ),
+        expire_after=3600,
+    )
+
+    # Keep connections alive between calls and retry transient server errors
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=10,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[502, 503, 504],
+            ),
+        ),
+    )
+
+    return session
+
+
+# ---------------------------------------------------
+# NAME NORMALIZATION
+# ---------------------------------------------------
+# Any run of whitespace, including the non-breaking spaces names copied
+# from the ODPC page carry. Literal characters instead of escapes, so the
+# pattern doesn't depend on one regex engine's escape syntax
+WHITESPACE_RUN = (
+    "[\\s\x1c-\x1f\x85\u00a0\u1680\u2000-\u200a"
+    "\u2028\u2029\u202f\u205f\u3000]+"
+)
+
+
+def normalize_names(names, case_option):
+    # Arrow-backed strings run these ops in C++ kernels. Collapsing
+    # whitespace costs a regex pass on top of strip and case folding, but
+    # read_html already collapses it on the ODPC side, so skipping it here
+    # would miss names pasted with doubled or non-breaking spaces
+    names = (
+        names.astype("string[pyarrow]")
+        .str.replace(WHITESPACE_RUN, " ", regex=True)
+        .str.strip()
+    )
+
+    if case_option == "Lowercase":
+        return names.str.lower()
+    return names.str.upper()
+
+
 # ---------------------------------------------------
 # SCRAPER FUNCTION
 # ---------------------------------------------------
-@st.cache_data(ttl=3600)  # Cache for 1 hour
+# ODPC columns used when matching and displaying results
+ODPC_COLUMNS = [
+    "NAME",
+    "TYPE",
+    "CURRENT STATE",
+    "REGISTRATION NUMBER",
+    "COUNTY",
+    "COUNTRY",
+]
+
+
+def parse_table_fallback(content):
+    # Manual row-by-row parse, used only when pandas can't read the table
+    import lxml.html
+    import pandas as pd
+
+    tables = lxml.html.fromstring(content).xpath("(//table)[1]")
+
+    if not tables:
+        return pd.DataFrame()
+
+    table = tables[0]
+    headers = [th.text_content().strip() for th in table.xpath(".//th")]
+    rows = []
+
+    for tr in table.xpath(".//tr")[1:]:
+        cells = [td.text_content().strip() for td in tr.xpath("./td")]
+        if len(cells) != len(headers):
+            continue
+
+        rows.append(cells)
+
+    return pd.DataFrame(rows, columns=headers)
+
+
+def build_odpc_lookup(odpc_df, case_option):
+    # Indexed lookup is much cheaper than a full merge
+    keys = normalize_names(odpc_df["NAME"], case_option)
+    lookup = odpc_df.set_index(keys.rename("odpc_normalized"))
+
+    # Matching is many-to-one: reindex() needs unique keys, so keep the
+    # first ODPC entry for each name (and skip the copy when already unique)
+    if not lookup.index.is_unique:
+        lookup = lookup[~lookup.index.duplicated(keep="first")]
+
+    return lookup
+
+
+# Runs in a worker thread, so it must not touch the UI: errors are raised
+# and reported by main(), and Streamlit's own cache spinner is disabled
+@st.cache_data(ttl=3600, show_spinner=False)  # Cache for 1 hour
 def scrape_odpc_data():
+    import pandas as pd
+
     url = "https://www.odpc.go.ke/registered-data-handlers/"
 
+    response = get_session().get(url, timeout=15)
+    response.raise_for_status()
+
+    # Parse the whole table in one call instead of looping over rows.
+    # Keep cells as literal strings (no number or thousands parsing),
+    # so registration numbers like "00123" survive
     try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
+        odpc_df = pd.read_html(
+            BytesIO(response.content),
+            flavor="lxml",
+            keep_default_na=False,
+            thousands=None,
+            converters={col: str for col in ODPC_COLUMNS},
+        )[0]
+    except ValueError:
+        odpc_df = parse_table_fallback(response.content)
 
-        soup = BeautifulSoup(response.content, "html.parser")
-        table = soup.find("table")
+    if odpc_df.empty:
+        return odpc_df, {}
 
-        if table is None:
-            return pd.DataFrame()
+    # Clean ODPC columns
+    odpc_df.columns = odpc_df.columns.str.strip()
 
-        headers = [th.text.strip() for th in table.find_all("th")]
-        rows = []
+    if "NAME" not in odpc_df.columns:
+        return odpc_df, {}
 
-        for tr in table.find_all("tr")[1:]:
-            cells = tr.find_all("td")
-            if len(cells) != len(headers):
-                continue
+    # Drop columns nothing downstream uses
+    odpc_df = odpc_df[[col for col in ODPC_COLUMNS if col in odpc_df.columns]]
 
-            row = {headers[i]: cells[i].text.strip() for i in range(len(headers))}
-            rows.append(row)
+    # Build the lookups here so they come from the same scrape as odpc_df
+    # and are built once per cache period, not on every upload
+    lookups = {
+        case_option: build_odpc_lookup(odpc_df, case_option)
+        for case_option in ["Lowercase", "Uppercase"]
+    }
 
-        return pd.DataFrame(rows)
+    return odpc_df, lookups
 
-    except Exception as e:
-        st.error(f"Scraping error: {e}")
-        return pd.DataFrame()
+
+# ---------------------------------------------------
+# MATCHING
+# ---------------------------------------------------
+def match_providers(df, lookup):
+    import pandas as pd
+
+    # Look up each distinct provider once, then broadcast back to every row
+    codes, unique_names = pd.factorize(
+        df["provider_normalized"], use_na_sentinel=False
+    )
+    matches = lookup.reindex(unique_names).take(codes)
+    return pd.concat([df, matches.set_axis(df.index)], axis=1)
+
+
+# ---------------------------------------------------
+# EXCEL READER
+# ---------------------------------------------------
+def read_workbook(uploaded_file, **read_kwargs):
+    import pandas as pd
+
+    read_kwargs.setdefault("sheet_name", 0)
+    read_kwargs.setdefault("dtype", {"Provider Name": "string[pyarrow]"})
+
+    try:
+        # calamine (Rust) is much faster than openpyxl on large sheets
+        return pd.read_excel(uploaded_file, engine="calamine", **read_kwargs)
+    except ImportError:
+        uploaded_file.seek(0)
+        return pd.read_excel(uploaded_file, engine="openpyxl", **read_kwargs)
+
+
+def read_excel_file(uploaded_file):
+    try:
+        # Only parse the one column we actually use
+        return read_workbook(uploaded_file, usecols=["Provider Name"])
+    except ValueError:
+        # Header not matched exactly (e.g. stray spaces), read every column
+        uploaded_file.seek(0)
+        return read_workbook(uploaded_file)
+
+
+# ---------------------------------------------------
+# EXCEL WRITER
+# ---------------------------------------------------
+def build_excel_download(result_df):
+    import pandas as pd
+
+    output = BytesIO()
+
+    # No constant_memory here: to_excel writes column by column, and that
+    # mode silently drops cells in rows it has already flushed
+    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
+        result_df.to_excel(writer, index=False, sheet_name="Results")
+
+    output.seek(0)
+    return output
 
 
 # ---------------------------------------------------
@@ -67,11 +268,21 @@ def main():
         st.info("Please upload an Excel file to begin.")
         return
 
+    # Start fetching ODPC while the upload is parsed. The worker gets this
+    # session's script context for st.cache_data, but never writes to the UI
+    executor = ThreadPoolExecutor(
+        max_workers=1,
+        initializer=add_script_run_ctx,
+        initargs=(None, get_script_run_ctx()),
+    )
+    odpc_future = executor.submit(scrape_odpc_data)
+    executor.shutdown(wait=False)
+
     # -----------------------------
     # READ EXCEL SAFELY
     # -----------------------------
     try:
-        df = pd.read_excel(uploaded_file, engine="openpyxl")
+        df = read_excel_file(uploaded_file)
     except Exception as e:
         st.error(f"Error reading Excel file: {e}")
         return
@@ -84,57 +295,42 @@ def main():
         st.write("Columns found:", df.columns.tolist())
         return
 
+    # Only Provider Name is used, drop anything else read from the file
+    df = df[["Provider Name"]].copy()
+
     # Normalize user data
-    if case_option == "Lowercase":
-        df["provider_normalized"] = (
-            df["Provider Name"].astype(str).str.strip().str.lower()
-        )
-    else:
-        df["provider_normalized"] = (
-            df["Provider Name"].astype(str).str.strip().str.upper()
-        )
+    df["provider_normalized"] = normalize_names(
+        df["Provider Name"], case_option
+    )
 
     # -----------------------------
     # SCRAPE ODPC
     # -----------------------------
     with st.spinner("🔍 Fetching ODPC data..."):
-        odpc_df = scrape_odpc_data()
+        try:
+            odpc_df, odpc_lookups = odpc_future.result()
+        except Exception as e:
+            st.error(f"Scraping error: {e}")
+            st.error("⚠️ Could not retrieve ODPC data.")
+            return
 
     if odpc_df.empty:
         st.error("⚠️ Could not retrieve ODPC data.")
         return
 
-    # Clean ODPC columns
-    odpc_df.columns = odpc_df.columns.str.strip()
-
     if "NAME" not in odpc_df.columns:
         st.error("ODPC website structure changed. 'NAME' column not found.")
         st.write("Available ODPC columns:", odpc_df.columns.tolist())
         return
 
-    # Normalize ODPC data
-    if case_option == "Lowercase":
-        odpc_df["odpc_normalized"] = (
-            odpc_df["NAME"].astype(str).str.strip().str.lower()
-        )
-    else:
-        odpc_df["odpc_normalized"] = (
-            odpc_df["NAME"].astype(str).str.strip().str.upper()
-        )
-
     # -----------------------------
-    # MERGE
+    # MATCH
     # -----------------------------
-    merged_df = pd.merge(
-        df,
-        odpc_df,
-        left_on="provider_normalized",
-        right_on="odpc_normalized",
-        how="left"
-    )
+    lookup = odpc_lookups[case_option]
 
-    # Add matched column safely
-    merged_df["Matched Name"] = merged_df.get("NAME", None)
+    df = match_providers(df, lookup)
+
+    df = df.rename(columns={"NAME": "Matched Name"})
 
     # Columns to show (safe selection)
     desired_columns = [
@@ -148,10 +344,10 @@ def main():
     ]
 
     available_columns = [
-        col for col in desired_columns if col in merged_df.columns
+        col for col in desired_columns if col in df.columns
     ]
 
-    result_df = merged_df[available_columns]
+    result_df = df[available_columns]
 
     # -----------------------------
     # DISPLAY RESULTS
@@ -162,15 +358,22 @@ def main():
     # -----------------------------
     # DOWNLOAD BUTTON
     # -----------------------------
-    output = BytesIO()
-    result_df.to_excel(output, index=False, engine="openpyxl")
-    output.seek(0)
-
+    # Files are only built when their button is clicked, and clicking
+    # doesn't rerun the script
     st.download_button(
         label="📥 Download Results as Excel",
-        data=output,
+        data=lambda: build_excel_download(result_df),
         file_name="odpc_provider_results.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        on_click="ignore",
+    )
+
+    st.download_button(
+        label="📥 Download Results as CSV",
+        data=lambda: result_df.to_csv(index=False).encode("utf-8"),
+        file_name="odpc_provider_results.csv",
+        mime="text/csv",
+        on_click="ignore",
     )
 
     st.caption(
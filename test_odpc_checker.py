@@ -0,0 +1,89 @@
+from io import StringIO
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("lxml")
+pytest.importorskip("streamlit")
+pytest.importorskip("xlsxwriter")
+pytest.importorskip("openpyxl")
+
+from odpc_checker import (
+    build_excel_download,
+    build_odpc_lookup,
+    match_providers,
+    normalize_names,
+)
+
+
+def test_excel_download_round_trips_every_cell():
+    result_df = pd.DataFrame(
+        {
+            "Provider Name": ["Alpha Ltd", "Beta Corp", "Gamma Inc"],
+            "Matched Name": ["ALPHA LTD", None, "GAMMA INC"],
+            "TYPE": ["Data Controller", None, "Data Processor"],
+            "REGISTRATION NUMBER": ["00123", None, "1,234"],
+        }
+    )
+
+    output = build_excel_download(result_df)
+    read_back = pd.read_excel(
+        output,
+        engine="openpyxl",
+        sheet_name="Results",
+        dtype=str,
+        keep_default_na=False,
+    )
+
+    pd.testing.assert_frame_equal(read_back, result_df.fillna(""))
+
+
+def test_normalize_names_collapses_unicode_whitespace():
+    names = pd.Series(["Alpha \xa0Ltd", "Alpha\xa0Ltd", "  Alpha\u2003 Ltd\n"])
+
+    assert normalize_names(names, "Lowercase").tolist() == ["alpha ltd"] * 3
+
+
+def test_normalize_names_matches_read_html_cells():
+    html = (
+        "<table><tr><th>NAME</th></tr>"
+        "<tr><td>Alpha &nbsp;Ltd</td></tr></table>"
+    )
+    odpc_names = pd.read_html(StringIO(html), flavor="lxml")[0]["NAME"]
+    upload_names = pd.Series(["Alpha \xa0Ltd"])
+
+    assert (
+        normalize_names(odpc_names, "Uppercase").tolist()
+        == normalize_names(upload_names, "Uppercase").tolist()
+    )
+
+
+def test_match_providers_handles_duplicates_blanks_and_misses():
+    odpc_df = pd.DataFrame(
+        {
+            "NAME": ["Alpha Ltd", "ALPHA  LTD", "Beta Corp"],
+            "TYPE": ["Data Controller", "Data Processor", "Data Processor"],
+        }
+    )
+    lookup = build_odpc_lookup(odpc_df, "Lowercase")
+
+    df = pd.DataFrame(
+        {"Provider Name": ["alpha ltd", "Beta Corp", None, "Gamma Inc", "alpha ltd"]},
+        index=[10, 11, 12, 13, 14],
+    )
+    df["provider_normalized"] = normalize_names(df["Provider Name"], "Lowercase")
+
+    result = match_providers(df, lookup)
+
+    # One result row per uploaded row, in upload order
+    assert result.index.tolist() == [10, 11, 12, 13, 14]
+    assert result["Provider Name"].tolist()[:2] == ["alpha ltd", "Beta Corp"]
+
+    # Duplicate ODPC names keep the first entry; blanks and misses match nothing
+    assert result["NAME"].fillna("").tolist() == [
+        "Alpha Ltd", "Beta Corp", "", "", "Alpha Ltd",
+    ]
+    assert result["TYPE"].fillna("").tolist() == [
+        "Data Controller", "Data Processor", "", "", "Data Controller",
+    ]